@@ -0,0 +1,170 @@
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from city_index import CityIndex, needs_translation
+from event_search import (DEFAULT_EVENT_LIMIT, build_event_query, clamp_limit, collect_events,
+                          local_now, resolve_date_range)
+from upstream_cache import StaleWhileRevalidateCache, UpstreamUnavailableError
+
+OPENWEATHER_BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
+SUNRISE_SUNSET_BASE_URL = "https://api.sunrise-sunset.org/json"
+
+# Background fetches are bounded too, so a hung upstream cannot pin worker threads
+REQUEST_TIMEOUT_SECONDS = 10
+# Overall limit for a paged event search, however many pages it needs
+EVENTS_FETCH_DEADLINE_SECONDS = 20
+
+# How long a value counts as fresh before it is served stale and refreshed
+WEATHER_TTL_SECONDS = 600
+SUN_TIMES_TTL_SECONDS = 6 * 3600
+EVENTS_TTL_SECONDS = 900
+# Event lists go out of date quickly, so they are not served stale for long during outages
+EVENTS_MAX_STALE_SECONDS = 3600
+
+cache = StaleWhileRevalidateCache()
+
+# Loaded once at startup so city names resolve without an upstream round trip
+city_index = CityIndex.load()
+
+
+# key: cache key, params: OpenWeather location params, name: English name, city: index City or None
+ResolvedCity = namedtuple("ResolvedCity", ["key", "params", "name", "city"])
+
+
+class UnknownCityError(Exception):
+    """Raised for a Chinese, Japanese or Korean city name the local index cannot resolve"""
+
+
+def resolve_city(city):
+    """Canonical lookup for a user-supplied city name"""
+    match = city_index.resolve(city)
+    if match is not None:
+        # Coordinates from the index pin the exact place, whatever OpenWeather calls it
+        return ResolvedCity(match.id, {"lat": match.lat, "lon": match.lon}, match.name, match)
+    if needs_translation(city):
+        # Upstreams cannot match CJK names, so the model has to translate this one
+        raise UnknownCityError(f'"{city}" is not in the local city index; retry with the English city name')
+    # Unknown to the local index; let OpenWeather try the raw name (Latin names like "Kraków" work there)
+    return ResolvedCity(city.strip().lower(), {"q": city.strip()}, city.strip(), None)
+
+
+def fetch_weather(location_params, api_key):
+    """Call OpenWeather for current conditions and reduce the response to what the agent reports"""
+    response = requests.get(
+        OPENWEATHER_BASE_URL,
+        params={**location_params, "appid": api_key, "units": "metric"},
+        timeout=REQUEST_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+    body = response.json()
+
+    conditions = body.get("weather", [{}])[0]
+    main = body.get("main", {})
+    return {
+        "city": body.get("name"),
+        "country": body.get("sys", {}).get("country"),
+        "lat": body.get("coord", {}).get("lat"),
+        "lon": body.get("coord", {}).get("lon"),
+        "temperature": main.get("temp"),
+        "feels_like": main.get("feels_like"),
+        "humidity": main.get("humidity"),
+        "conditions": conditions.get("description"),
+        "wind_speed": body.get("wind", {}).get("speed"),
+        "utc_offset_seconds": body.get("timezone", 0),
+    }
+
+
+def fetch_sun_times(lat, lon, utc_offset_seconds, day):
+    """Call sunrise-sunset for one day and convert the UTC times to the city's local time"""
+    response = requests.get(
+        SUNRISE_SUNSET_BASE_URL,
+        params={"lat": lat, "lng": lon, "formatted": 0, "date": day},
+        timeout=REQUEST_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+    results = response.json().get("results", {})
+
+    local = timezone(timedelta(seconds=utc_offset_seconds))
+    sun_times = {"date": day}
+    for field in ("sunrise", "sunset", "solar_noon"):
+        if results.get(field):
+            moment = datetime.fromisoformat(results[field]).astimezone(local)
+            sun_times[field] = moment.strftime("%H:%M")
+    sun_times["day_length_seconds"] = results.get("day_length")
+    return sun_times
+
+
+def _fetch_city_weather(resolved, api_key):
+    """Fetch weather and report it under the index's name, not the district OpenWeather maps coordinates to"""
+    weather = fetch_weather(resolved.params, api_key)
+    if resolved.city is not None:
+        weather.update(city=resolved.city.name, country=resolved.city.country)
+    return weather
+
+
+def get_weather(city, api_key):
+    """Current weather for a city, served from cache when fresh or when the upstream is slow"""
+    resolved = resolve_city(city)
+    return cache.get(("weather", resolved.key), lambda: _fetch_city_weather(resolved, api_key),
+                     ttl=WEATHER_TTL_SECONDS)
+
+
+def get_sun_times(city, api_key):
+    """Today's sunrise and sunset for a city.
+
+    Indexed cities use their own coordinates and timezone; others borrow them from the weather lookup.
+    """
+    resolved = resolve_city(city)
+    if resolved.city is not None:
+        lat, lon, offset = resolved.city.lat, resolved.city.lon, resolved.city.utc_offset_seconds()
+    else:
+        weather = get_weather(city, api_key).value
+        lat, lon, offset = weather["lat"], weather["lon"], weather["utc_offset_seconds"]
+    day = (datetime.now(timezone.utc) + timedelta(seconds=offset)).date().isoformat()
+
+    return cache.get(
+        ("sun_times", resolved.key, day),
+        lambda: fetch_sun_times(lat, lon, offset, day),
+        ttl=SUN_TIMES_TTL_SECONDS,
+    )
+
+
+def city_utc_offset(city, api_key):
+    """The city's current UTC offset from the index, else the (usually cached) weather lookup; None if unavailable"""
+    try:
+        resolved = resolve_city(city)
+        if resolved.city is not None:
+            return resolved.city.utc_offset_seconds()
+        return get_weather(city, api_key).value["utc_offset_seconds"]
+    except (UpstreamUnavailableError, UnknownCityError):
+        return None
+
+
+def get_events(city, api_key, when=None, category=None, keyword=None, limit=DEFAULT_EVENT_LIMIT,
+               utc_offset_seconds=None):
+    """Filtered event search, cached per resolved time window rather than per phrase.
+
+    Returns (CachedResult, window) where window is the applied [start, end] in local time, or None.
+    Raises UnrecognizedTimeError when `when` cannot be mapped to a window.
+    """
+    resolved = resolve_city(city)
+    limit = clamp_limit(limit)
+    now = local_now(utc_offset_seconds)
+    start, end = resolve_date_range(when, now=now)
+    params = build_event_query(resolved.name, api_key, when=when, category=category, keyword=keyword,
+                               limit=limit, now=now)
+
+    window = [start.isoformat(timespec="minutes"), end.isoformat(timespec="minutes")] if start else None
+    # Key on the window (start to the hour) so yesterday's "tonight" never answers today's
+    window_key = (start.replace(minute=0, second=0, microsecond=0).isoformat(), end.isoformat()) if start else None
+    key = ("events", resolved.key, window_key, params.get("classificationName"), keyword, limit)
+    cached = cache.get(
+        key,
+        lambda: collect_events(params, limit, deadline=time.monotonic() + EVENTS_FETCH_DEADLINE_SECONDS),
+        ttl=EVENTS_TTL_SECONDS,
+        max_stale=EVENTS_MAX_STALE_SECONDS,
+    )
+    return cached, window
@@ -0,0 +1,164 @@
+import os
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+CITY_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.tsv")
+
+# Fuzzy matches below this similarity are treated as unknown cities
+MIN_FUZZY_SCORE = 0.8
+# Only this many n-gram candidates are scored with edit distance
+MAX_FUZZY_CANDIDATES = 20
+# Short inputs and aliases must match exactly; "Bern" is not a typo of "BER"
+MIN_FUZZY_LENGTH = 4
+
+# Administrative suffixes users add that the aliases usually omit
+CITY_SUFFIXES = ("市", "city")
+
+_IGNORED_CHARACTERS = set(" \t.,-_'’·()")
+
+# Unicode name prefixes of scripts the upstream APIs cannot match, so such names need translating
+_UNTRANSLATED_SCRIPTS = ("CJK ", "HIRAGANA", "KATAKANA", "HALFWIDTH KATAKANA", "HANGUL", "HALFWIDTH HANGUL")
+
+# Traditional characters folded to Simplified so mixed-script input ("紐约") still matches
+_CJK_VARIANTS = str.maketrans(
+    "臺紐約倫東華頓爾蘭羅馬維納蘇聖門開買內貢圖磯舊溫奧漢裡亞灣島濟廣陽寧慶蕭園蓮義",
+    "台纽约伦东华顿尔兰罗马维纳苏圣门开买内贡图矶旧温奥汉里亚湾岛济广阳宁庆萧园莲义",
+)
+
+
+class City:
+    """Canonical city record from the alias index"""
+
+    __slots__ = ("id", "name", "country", "lat", "lon", "timezone")
+
+    def __init__(self, id, name, country, lat, lon, timezone):
+        self.id = id
+        self.name = name
+        self.country = country
+        self.lat = lat
+        self.lon = lon
+        self.timezone = timezone
+
+    def utc_offset_seconds(self):
+        """The city's current UTC offset, daylight saving included"""
+        return int(datetime.now(ZoneInfo(self.timezone)).utcoffset().total_seconds())
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "country": self.country, "lat": self.lat, "lon": self.lon,
+                "timezone": self.timezone}
+
+
+def needs_translation(text):
+    """Check for Chinese, Japanese or Korean characters, which upstreams cannot look up by name"""
+    return any(unicodedata.name(char, "").startswith(_UNTRANSLATED_SCRIPTS) for char in text)
+
+
+def normalize(text):
+    """Fold case, width and accents and drop spacing/punctuation so aliases compare equal"""
+    text = unicodedata.normalize("NFKC", text).casefold().translate(_CJK_VARIANTS)
+    decomposed = unicodedata.normalize("NFD", text)
+    stripped = "".join(
+        char for char in decomposed
+        if char not in _IGNORED_CHARACTERS and not unicodedata.combining(char)
+    )
+    return unicodedata.normalize("NFC", stripped)
+
+
+def _ngrams(text):
+    """Character n-grams: bigrams for CJK-style text, trigrams for alphabetic text"""
+    size = 3 if text.isascii() else 2
+    padded = f"^{text}$"
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+def _is_abbreviation(alias):
+    """Upper-case ASCII aliases (NYC, L.A., BER) are codes, matched exactly and never fuzzily"""
+    return alias.isascii() and any(char.isalpha() for char in alias) and alias == alias.upper()
+
+
+def _edit_similarity(a, b):
+    """Damerau-Levenshtein (optimal string alignment) distance scaled to a 0..1 similarity"""
+    rows = [list(range(len(b) + 1))]
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            cost = min(rows[-1][j] + 1, current[j - 1] + 1, rows[-1][j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, rows[-2][j - 2] + 1)
+            current.append(cost)
+        rows.append(current)
+    return 1 - rows[-1][-1] / max(len(a), len(b), 1)
+
+
+class CityIndex:
+    """In-memory multilingual alias index with an n-gram fuzzy fallback"""
+
+    def __init__(self, cities):
+        self._aliases = {}
+        self._grams = defaultdict(set)
+        for city, aliases in cities:
+            for alias in [city.name, *aliases]:
+                key = normalize(alias)
+                # The first city to claim an alias keeps it
+                if not key or key in self._aliases:
+                    continue
+                self._aliases[key] = city
+                if len(key) >= MIN_FUZZY_LENGTH and not _is_abbreviation(alias):
+                    for gram in _ngrams(key):
+                        self._grams[gram].add(key)
+
+    @classmethod
+    def load(cls, path=CITY_INDEX_PATH):
+        """Load the tab-separated city file: id, name, country, lat, lon, timezone, |-separated aliases"""
+        cities = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                city_id, name, country, lat, lon, tz, aliases = line.rstrip("\n").split("\t")
+                city = City(int(city_id), name, country, float(lat), float(lon), tz)
+                cities.append((city, aliases.split("|")))
+        return cls(cities)
+
+    def __len__(self):
+        return len(self._aliases)
+
+    def resolve(self, query):
+        """Map user input to a canonical City, or None when nothing is close enough"""
+        key = normalize(query)
+        if not key:
+            return None
+
+        city = self._exact(key)
+        if city is not None or len(key) < MIN_FUZZY_LENGTH:
+            return city
+        return self._fuzzy(key)
+
+    def _exact(self, key):
+        if key in self._aliases:
+            return self._aliases[key]
+        for suffix in CITY_SUFFIXES:
+            if key.endswith(suffix) and key[:-len(suffix)] in self._aliases:
+                return self._aliases[key[:-len(suffix)]]
+        return None
+
+    def _fuzzy(self, key):
+        """Score aliases sharing the most n-grams with the input by edit distance"""
+        overlap = Counter()
+        for gram in _ngrams(key):
+            overlap.update(self._grams.get(gram, ()))
+
+        best_score, best_alias = 0.0, None
+        for alias, _ in overlap.most_common(MAX_FUZZY_CANDIDATES):
+            # Typos rarely change the first letter; "New Taipei" is not a misspelt "Taipei"
+            if alias[0] != key[0]:
+                continue
+            score = _edit_similarity(key, alias)
+            if score > best_score:
+                best_score, best_alias = score, alias
+
+        if best_score < MIN_FUZZY_SCORE:
+            return None
+        return self._aliases[best_alias]
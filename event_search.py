@@ -0,0 +1,247 @@
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import requests
+
+TICKETMASTER_BASE_URL = "https://app.ticketmaster.com/discovery/v2/events.json"
+
+# Ticketmaster rejects deep paging once page * size reaches 1000
+TICKETMASTER_MAX_DEPTH = 1000
+DEFAULT_EVENT_LIMIT = 5
+MAX_PAGE_SIZE = 50
+# Upper bound on events returned per search, whatever the caller asks for
+MAX_EVENT_LIMIT = 2 * MAX_PAGE_SIZE
+REQUEST_TIMEOUT_SECONDS = 10
+
+# User wording (English and Chinese) mapped to Ticketmaster segment names
+CATEGORY_ALIASES = {
+    "Music": ["music", "concert", "concerts", "gig", "gigs", "音樂", "音乐", "演唱會", "演唱会", "音樂會", "音乐会"],
+    "Sports": ["sport", "sports", "game", "games", "match", "運動", "运动", "比賽", "比赛"],
+    "Arts & Theatre": ["arts", "art", "theatre", "theater", "musical", "show", "shows", "comedy",
+                       "藝術", "艺术", "展覽", "展览", "戲劇", "戏剧", "演出", "表演"],
+    "Film": ["film", "films", "movie", "movies", "cinema", "電影", "电影"],
+    "Family": ["family", "kids", "children", "親子", "亲子", "家庭"],
+}
+
+# Dates that are still listed upstream but cannot be attended
+UNLISTABLE_STATUSES = {"cancelled", "canceled", "offsale"}
+
+# Weekday names (English and Chinese) -> Monday-based weekday number
+WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+}
+CHINESE_WEEKDAYS = {"一": 0, "二": 1, "三": 2, "四": 3, "五": 4, "六": 5, "日": 6, "天": 6}
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d")
+
+
+class UnrecognizedTimeError(ValueError):
+    """Raised for a time phrase that cannot be turned into a date window"""
+
+
+def clamp_limit(limit):
+    """Keep a caller-supplied event count within 1..MAX_EVENT_LIMIT"""
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_EVENT_LIMIT
+    return max(1, min(limit, MAX_EVENT_LIMIT))
+
+
+def resolve_category(category):
+    """Map a free-text category to a Ticketmaster classification name"""
+    if not category:
+        return None
+    wanted = category.strip().lower()
+    for classification, aliases in CATEGORY_ALIASES.items():
+        if wanted == classification.lower() or wanted in aliases:
+            return classification
+    # Unknown wording is still useful upstream as a classification filter
+    return category.strip()
+
+
+def local_now(utc_offset_seconds=None):
+    """Current wall-clock time in a city as a naive datetime; UTC when the offset is unknown"""
+    moment = datetime.now(timezone.utc) + timedelta(seconds=utc_offset_seconds or 0)
+    return moment.replace(tzinfo=None)
+
+
+def _weekday(phrase):
+    """Weekday number for "friday", "this friday", "週五" or "星期五", else None"""
+    if phrase.startswith("this "):
+        phrase = phrase[len("this "):]
+    if phrase in WEEKDAYS:
+        return WEEKDAYS[phrase]
+    for prefix in ("星期", "週", "周", "禮拜", "礼拜"):
+        if phrase.startswith(prefix) and phrase[len(prefix):] in CHINESE_WEEKDAYS:
+            return CHINESE_WEEKDAYS[phrase[len(prefix):]]
+    return None
+
+
+def resolve_date_range(when, now=None):
+    """Turn phrases like "today" or "this weekend" into a (start, end) window in the city's local time.
+
+    Returns (None, None) when no phrase is given and raises UnrecognizedTimeError for unknown phrases.
+    """
+    if not when:
+        return None, None
+
+    now = now or local_now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    phrase = when.strip().lower()
+
+    if phrase in ("today", "今天", "今日"):
+        return now, today + timedelta(days=1)
+    if phrase in ("tonight", "今晚"):
+        return max(now, today + timedelta(hours=17)), today + timedelta(days=1)
+    if phrase in ("tomorrow", "明天", "明日"):
+        return today + timedelta(days=1), today + timedelta(days=2)
+    if phrase in ("this weekend", "weekend", "這週末", "这周末", "週末", "周末"):
+        # Saturday 00:00 through Sunday 23:59; already inside the weekend starts now
+        saturday = today + timedelta(days=(5 - today.weekday()) % 7)
+        if today.weekday() == 6:
+            saturday = today - timedelta(days=1)
+        return max(now, saturday), saturday + timedelta(days=2)
+    if phrase in ("next weekend", "下週末", "下周末"):
+        saturday = today + timedelta(days=(5 - today.weekday()) % 7 + 7)
+        if today.weekday() == 6:
+            saturday = today + timedelta(days=6)
+        return saturday, saturday + timedelta(days=2)
+    if phrase in ("this week", "本週", "本周", "這週", "这周"):
+        return now, today + timedelta(days=7 - today.weekday())
+    if phrase in ("next week", "下週", "下周"):
+        monday = today + timedelta(days=7 - today.weekday())
+        return monday, monday + timedelta(days=7)
+    if phrase in ("this month", "本月", "這個月", "这个月"):
+        next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return now, next_month
+
+    weekday = _weekday(phrase)
+    if weekday is not None:
+        day = today + timedelta(days=(weekday - today.weekday()) % 7)
+        return max(now, day), day + timedelta(days=1)
+
+    # Fall back to an explicit date (YYYY-MM-DD or YYYY/MM/DD) for a single day
+    for date_format in DATE_FORMATS:
+        try:
+            day = datetime.strptime(phrase, date_format)
+        except ValueError:
+            continue
+        return day, day + timedelta(days=1)
+    raise UnrecognizedTimeError(f'Unrecognized time phrase "{when}"')
+
+
+def _format_local_range(start, end):
+    """Format a local window as Ticketmaster's localStartDateTime range (inclusive end)"""
+    end = end - timedelta(seconds=1)
+    return f"{start:%Y-%m-%dT%H:%M:%S},{end:%Y-%m-%dT%H:%M:%S}"
+
+
+def build_event_query(city, api_key, when=None, category=None, keyword=None,
+                      limit=DEFAULT_EVENT_LIMIT, utc_offset_seconds=None, now=None):
+    """Build Ticketmaster query parameters from user constraints"""
+    limit = clamp_limit(limit)
+    params = {
+        "apikey": api_key,
+        "city": city,
+        "sort": "date,asc",
+        # Over-fetch slightly so locally dropped dates rarely cost another page
+        "size": max(1, min(limit + 2, MAX_PAGE_SIZE)),
+    }
+
+    # Windows are matched against each event's local start time, so "tonight" means evening at the venue
+    start, end = resolve_date_range(when, now=now or local_now(utc_offset_seconds))
+    if start:
+        params["localStartDateTime"] = _format_local_range(start, end)
+
+    classification = resolve_category(category)
+    if classification:
+        params["classificationName"] = classification
+    if keyword:
+        params["keyword"] = keyword
+
+    return params
+
+
+def iter_event_pages(params, session=None, timeout=REQUEST_TIMEOUT_SECONDS, deadline=None):
+    """Lazily yield raw event lists page by page until the results run out.
+
+    deadline is a time.monotonic() value; once it passes no further pages are requested, and
+    each page's timeout is cut to the time remaining.
+    """
+    http = session or requests
+    page = 0
+
+    while True:
+        page_timeout = timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            page_timeout = min(timeout, remaining)
+        response = http.get(
+            TICKETMASTER_BASE_URL,
+            params={**params, "page": page},
+            timeout=page_timeout,
+        )
+        response.raise_for_status()
+        body = response.json()
+
+        events = body.get("_embedded", {}).get("events", [])
+        if not events:
+            return
+        yield events
+
+        page_info = body.get("page", {})
+        page += 1
+        if page >= page_info.get("totalPages", 0):
+            return
+        if (page + 1) * params["size"] > TICKETMASTER_MAX_DEPTH:
+            return
+
+
+def _is_listable(event):
+    """Check whether an event date can still be attended"""
+    status = event.get("dates", {}).get("status", {}).get("code", "")
+    return status.lower() not in UNLISTABLE_STATUSES
+
+
+def summarize_event(event):
+    """Reduce a Ticketmaster event to the fields the agent needs"""
+    start = event.get("dates", {}).get("start", {})
+    venues = event.get("_embedded", {}).get("venues", [])
+    classifications = event.get("classifications", [])
+
+    return {
+        "name": event.get("name"),
+        "date": start.get("localDate"),
+        "time": start.get("localTime"),
+        "venue": venues[0].get("name") if venues else None,
+        "category": classifications[0].get("segment", {}).get("name") if classifications else None,
+        "url": event.get("url"),
+    }
+
+
+def iter_events(params, session=None, deadline=None):
+    """Stream listable events across pages, fetching the next page only on demand"""
+    for events in iter_event_pages(params, session=session, deadline=deadline):
+        for event in events:
+            if _is_listable(event):
+                yield summarize_event(event)
+
+
+def collect_events(params, limit=DEFAULT_EVENT_LIMIT, session=None, deadline=None):
+    """Run a prepared query and stop paging once enough matches are collected or the deadline passes.
+
+    Results are sorted by date, so a search cut short by the deadline returns the earliest matches.
+    """
+    return list(islice(iter_events(params, session=session, deadline=deadline), clamp_limit(limit)))
+
+
+def search_events(city, api_key, when=None, category=None, keyword=None,
+                  limit=DEFAULT_EVENT_LIMIT, utc_offset_seconds=None, session=None):
+    """Search events from user constraints"""
+    limit = clamp_limit(limit)
+    params = build_event_query(city, api_key, when=when, category=category, keyword=keyword,
+                               limit=limit, utc_offset_seconds=utc_offset_seconds)
+    return collect_events(params, limit, session=session)
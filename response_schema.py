@@ -0,0 +1,150 @@
+import base64
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; without it only gzipped JSON and plain JSON are offered
+    msgpack = None
+
+RESPONSE_SCHEMA_VERSION = 1
+SUPPORTED_SCHEMA_VERSIONS = (1,)
+
+# Payloads smaller than this are sent as plain JSON; compression would not pay off
+MIN_COMPRESS_BYTES = 512
+
+# Fields of each v1 block type; every block also carries "stale" and "age_seconds"
+WEATHER_FIELDS = ("city", "country", "temperature", "feels_like", "humidity", "conditions", "wind_speed")
+SUN_TIMES_FIELDS = ("city", "date", "sunrise", "sunset", "solar_noon", "day_length_seconds")
+EVENT_FIELDS = ("city", "name", "date", "time", "venue", "category", "url")
+
+
+def schema_version_error(version):
+    """Error body for a requested schema version this agent cannot produce, or None if supported"""
+    if isinstance(version, int) and not isinstance(version, bool) and version in SUPPORTED_SCHEMA_VERSIONS:
+        return None
+    return {
+        "code": "UnsupportedSchemaVersion",
+        "message": f"Response schema version {version!r} is not supported",
+        "supported": list(SUPPORTED_SCHEMA_VERSIONS),
+        "retryable": False,
+    }
+
+
+def supported_encodings():
+    """Encodings this side can produce and decode, in preference order"""
+    encodings = ["msgpack+gzip"] if msgpack is not None else []
+    return encodings + ["gzip", "identity"]
+
+
+def _message_text(message):
+    """Join the text content blocks of an agent message"""
+    content = message.get("content", []) if isinstance(message, dict) else []
+    return "\n".join(block["text"] for block in content if "text" in block)
+
+
+def _block(fields, source, freshness, **overrides):
+    """One flat block: the listed fields from a tool payload plus its freshness"""
+    block = {field: source.get(field) for field in fields}
+    block.update(overrides)
+    block["stale"] = bool(freshness.get("stale", False))
+    block["age_seconds"] = freshness.get("age_seconds")
+    return block
+
+
+def _weather_blocks(data, tool_input):
+    return [_block(WEATHER_FIELDS, data.get("weather") or {}, data.get("freshness") or {})]
+
+
+def _sun_times_blocks(data, tool_input):
+    return [_block(SUN_TIMES_FIELDS, data.get("sun_times") or {}, data.get("freshness") or {},
+                   city=tool_input.get("city"))]
+
+
+def _event_blocks(data, tool_input):
+    city = data.get("city") or tool_input.get("city")
+    freshness = data.get("freshness") or {}
+    return [_block(EVENT_FIELDS, event, freshness, city=city) for event in data.get("events") or []]
+
+
+# Agent tool name -> (response field, builder turning its JSON result into flat blocks)
+TOOL_BLOCKS = {
+    "current_weather": ("weather", _weather_blocks),
+    "sun_times": ("sun_times", _sun_times_blocks),
+    "find_events": ("events", _event_blocks),
+}
+
+
+def extract_blocks(messages):
+    """Collect flat weather, event and sun-time blocks from the tool results in a conversation"""
+    tool_uses = {}
+    blocks = {field: [] for field, _ in TOOL_BLOCKS.values()}
+
+    for message in messages:
+        for block in message.get("content", []):
+            if "toolUse" in block:
+                tool_uses[block["toolUse"]["toolUseId"]] = block["toolUse"]
+            elif "toolResult" in block:
+                result = block["toolResult"]
+                tool_use = tool_uses.get(result["toolUseId"], {})
+                if tool_use.get("name") not in TOOL_BLOCKS or result.get("status") == "error":
+                    continue
+                field, build = TOOL_BLOCKS[tool_use["name"]]
+                for item in result.get("content", []):
+                    try:
+                        data = json.loads(item.get("text", ""))
+                    except ValueError:
+                        continue
+                    if isinstance(data, dict) and "error" not in data:
+                        blocks[field].extend(build(data, tool_use.get("input") or {}))
+
+    return blocks
+
+
+def build_response(message, messages):
+    """Build the versioned compact response from the final agent message and its conversation"""
+    return {
+        "v": RESPONSE_SCHEMA_VERSION,
+        "answer": _message_text(message),
+        **extract_blocks(messages),
+    }
+
+
+def encode_response(response, accept_encoding=None):
+    """Encode a response with the first encoding the client accepts, falling back to plain JSON"""
+    encoding = next((e for e in accept_encoding or [] if e in supported_encodings()), "identity")
+    if encoding == "identity":
+        return response
+
+    plain = json.dumps(response, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(plain) < MIN_COMPRESS_BYTES:
+        return response
+
+    if encoding == "msgpack+gzip":
+        data = gzip.compress(msgpack.packb(response, use_bin_type=True))
+    else:
+        data = gzip.compress(plain)
+    encoded = base64.b64encode(data).decode("ascii")
+
+    # Base64 adds a third; keep plain JSON when compression did not win that back
+    if len(encoded) >= len(plain):
+        return response
+    return {
+        "v": RESPONSE_SCHEMA_VERSION,
+        "encoding": encoding,
+        "data": encoded,
+    }
+
+
+def decode_response(body):
+    """Decode a response envelope back into the compact response dict"""
+    encoding = body.get("encoding", "identity")
+    if encoding == "identity":
+        return body
+
+    data = base64.b64decode(body["data"])
+    if encoding == "gzip":
+        return json.loads(gzip.decompress(data))
+    if encoding == "msgpack+gzip" and msgpack is not None:
+        return msgpack.unpackb(gzip.decompress(data), raw=False)
+    raise ValueError(f"Unsupported response encoding: {encoding}")
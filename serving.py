@@ -0,0 +1,205 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from settings import env_float, env_int
+
+
+# Concurrent turns per CPU core by default; a turn spends nearly all its time waiting on I/O
+IO_BOUND_WORKERS_PER_CPU = 4
+
+
+class ServerBusyError(Exception):
+    """Raised when the request queue is full or a queued request waited too long"""
+
+
+class ServingConfig:
+    """Concurrency settings for one agent container, configured via environment variables"""
+
+    def __init__(self, max_concurrency=None, max_queue=None, queue_timeout=None,
+                 max_sessions=None, session_idle_timeout=None):
+        # Agent turns mostly wait on the model and upstream APIs, so run several per core
+        default_concurrency = IO_BOUND_WORKERS_PER_CPU * (os.cpu_count() or 1)
+        self.max_concurrency = max_concurrency or env_int("AGENT_MAX_CONCURRENCY", default_concurrency)
+        self.max_queue = max_queue if max_queue is not None else env_int("AGENT_MAX_QUEUE", self.max_concurrency * 2, minimum=0)
+        self.queue_timeout = queue_timeout if queue_timeout is not None else env_float("AGENT_QUEUE_TIMEOUT_SECONDS", 30.0)
+        self.max_sessions = max_sessions or env_int("AGENT_MAX_SESSIONS", 256)
+        self.session_idle_timeout = session_idle_timeout if session_idle_timeout is not None else env_float("AGENT_SESSION_IDLE_SECONDS", 1800.0)
+
+
+class RequestGate:
+    """Bounded admission control: N requests in flight, a bounded wait queue, reject when full.
+
+    Admission happens on the event loop, so waiting requests never hold a thread; admitted
+    requests run on a dedicated pool sized to max_concurrency.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ServingConfig()
+        self._slots = asyncio.Semaphore(self.config.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.config.max_concurrency, thread_name_prefix="agent")
+        self._in_flight = 0
+        self._queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    async def run(self, func, *args):
+        """Admit a request, then run func(*args) on a worker thread and return its result.
+
+        The slot is released when the worker finishes, not when the caller stops waiting, so a
+        cancelled request keeps counting against the limit until its thread is actually free.
+        """
+        await self._admit()
+        self._in_flight += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, f))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        """Account for a finished worker and hand its slot to the next request (on the event loop)"""
+        if future is None or future.cancelled() or future.exception() is not None:
+            self._failed += 1
+        else:
+            self._completed += 1
+        self._in_flight -= 1
+        self._slots.release()
+
+    async def _admit(self):
+        if not self._slots.locked():
+            # A free slot is taken without suspending, so the check and acquire cannot interleave
+            await self._slots.acquire()
+            return
+
+        if self._queued >= self.config.max_queue:
+            self._rejected += 1
+            raise ServerBusyError(
+                f"Server busy: {self._in_flight} requests in flight and {self._queued} queued"
+            )
+
+        self._queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.config.queue_timeout)
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            raise ServerBusyError(
+                f"Request waited more than {self.config.queue_timeout:g}s for a free worker"
+            )
+        finally:
+            self._queued -= 1
+
+    def is_saturated(self):
+        """Check whether new requests would have to queue"""
+        return self._in_flight >= self.config.max_concurrency
+
+    def metrics(self):
+        """Snapshot of queue depth, in-flight requests and lifetime counters"""
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self._queued,
+            "max_concurrency": self.config.max_concurrency,
+            "max_queue": self.config.max_queue,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+        }
+
+
+class TurnRecorder:
+    """Agent callback handler that keeps the messages added during the current turn.
+
+    Unlike slicing agent.messages, this is unaffected by the conversation manager trimming
+    history from the front while the turn runs.
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def start_turn(self):
+        self.messages = []
+
+    def __call__(self, **kwargs):
+        message = kwargs.get("message")
+        if message is not None:
+            self.messages.append(message)
+
+
+class _Session:
+    __slots__ = ("agent", "recorder", "lock", "last_used")
+
+    def __init__(self, factory):
+        self.recorder = TurnRecorder()
+        self.agent = factory(callback_handler=self.recorder)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class AgentSessions:
+    """Per-session agents so conversation history survives across turns, with LRU and idle eviction.
+
+    factory(callback_handler=...) must build an agent that reports its messages to the handler.
+    """
+
+    def __init__(self, factory, config=None):
+        self.config = config or ServingConfig()
+        self._factory = factory
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @contextmanager
+    def checkout(self, session_id):
+        """Hold the agent for a session; calls without a session id get a throwaway agent"""
+        with self._checkout(session_id) as session:
+            yield session.agent
+
+    def run_turn(self, session_id, prompt):
+        """Run one turn on the session's agent and return the result with the messages it added"""
+        with self._checkout(session_id) as session:
+            session.recorder.start_turn()
+            result = session.agent(prompt)
+            return result, session.recorder.messages
+
+    @contextmanager
+    def _checkout(self, session_id):
+        if not session_id:
+            yield _Session(self._factory)
+            return
+
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self._factory)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.config.max_sessions:
+                self._sessions.popitem(last=False)
+
+        # Turns of one session run one at a time; an agent is not safe to share concurrently
+        with session.lock:
+            session.last_used = time.monotonic()
+            try:
+                yield session
+            finally:
+                session.last_used = time.monotonic()
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.config.session_idle_timeout
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                return
+            del self._sessions[session_id]
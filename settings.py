@@ -0,0 +1,19 @@
+import os
+
+
+def env_int(name, default, minimum=1):
+    """Read an integer setting from the environment, falling back on bad values"""
+    try:
+        value = int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value >= minimum else default
+
+
+def env_float(name, default, minimum=0.0):
+    """Read a float setting from the environment, falling back on bad values"""
+    try:
+        value = float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value >= minimum else default
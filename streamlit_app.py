@@ -5,6 +5,9 @@ import time
 from datetime import datetime
 from botocore.exceptions import ClientError
 import os
+import uuid
+
+from response_schema import RESPONSE_SCHEMA_VERSION, decode_response, supported_encodings
 
 # Configure Streamlit page settings and layout
 st.set_page_config(
@@ -34,6 +37,8 @@ class WeatherAgentClient:
         self.connection_status = "disconnected"
         self.last_error = None
         self.connection_verified = False
+        # Runtime session id keeps conversation history on the agent across turns
+        self.runtime_session_id = str(uuid.uuid4())
         
         # Initialize AWS SDK integration
         self._initialize_aws_session()
@@ -70,6 +75,10 @@ class WeatherAgentClient:
             self.client = None
             self.session = None
     
+    def reset_session(self):
+        """Start a new agent session so the next query begins a fresh conversation"""
+        self.runtime_session_id = str(uuid.uuid4())
+    
     def get_connection_status(self):
         """Get detailed connection status information"""
         return {
@@ -93,8 +102,8 @@ class WeatherAgentClient:
             }
         
         try:
-            # Test with a simple query
-            test_result = self.query_weather("Hello, test connection")
+            # Test with a simple query in its own session so it stays out of the conversation
+            test_result = self.query_weather("Hello, test connection", session_id=str(uuid.uuid4()))
             if test_result['success']:
                 self.connection_verified = True
                 return {
@@ -184,7 +193,7 @@ class WeatherAgentClient:
         
         return response
     
-    def query_weather(self, prompt: str) -> dict:
+    def query_weather(self, prompt: str, session_id: str = None) -> dict:
         """Query weather information with comprehensive error handling and standardized responses"""
         # Check client availability
         if not self.client:
@@ -202,12 +211,17 @@ class WeatherAgentClient:
             )
         
         try:
-            # Prepare payload
-            payload = {"prompt": prompt}
+            # Prepare payload, negotiating the compact schema and its encoding
+            payload = {
+                "prompt": prompt,
+                "schema_version": RESPONSE_SCHEMA_VERSION,
+                "accept_encoding": supported_encodings()
+            }
             
             # Make API call
             response = self.client.invoke_agent_runtime(
                 agentRuntimeArn=self.agent_arn,
+                runtimeSessionId=session_id or self.runtime_session_id,
                 payload=json.dumps(payload)
             )
             
@@ -220,15 +234,39 @@ class WeatherAgentClient:
             else:
                 response_body = response
             
-            # Extract response text with multiple fallback strategies
-            response_text = self._extract_response_text(response_body)
+            # Agent-side rejections (e.g. ServerBusy) are reported as retryable service errors
+            if isinstance(response_body, dict) and isinstance(response_body.get('error'), dict):
+                agent_error = response_body['error']
+                error_info = self._categorize_error('service', agent_error.get('code'), agent_error.get('message'))
+                return self._create_standardized_response(
+                    success=False,
+                    error_info={
+                        'type': 'agent_error',
+                        'code': agent_error.get('code'),
+                        'message': error_info['message'],
+                        'category': error_info['category'],
+                        'retryable': agent_error.get('retryable', error_info['retryable']),
+                        'guidance': error_info['guidance'],
+                        'raw_message': agent_error.get('message')
+                    }
+                )
+            
+            # Compact schema decodes directly; older agents fall back to text extraction
+            blocks = {}
+            if isinstance(response_body, dict) and 'v' in response_body:
+                compact = decode_response(response_body)
+                response_text = compact.get('answer') or '無回應資料'
+                blocks = {name: compact.get(name, []) for name in ('weather', 'events', 'sun_times')}
+            else:
+                response_text = self._extract_response_text(response_body)
             
             # Create metadata
             metadata = {
                 'request_id': response.get('ResponseMetadata', {}).get('RequestId'),
                 'http_status': response.get('ResponseMetadata', {}).get('HTTPStatusCode'),
                 'agent_arn': self.agent_arn,
-                'region': self.region_name
+                'region': self.region_name,
+                'blocks': blocks
             }
             
             return self._create_standardized_response(
@@ -301,7 +339,7 @@ class WeatherAgentClient:
             )
     
     def _extract_response_text(self, response_body: dict) -> str:
-        """Extract response text from various response body formats"""
+        """Extract response text from legacy response body formats"""
         if not response_body:
             return '無回應資料'
         
@@ -397,6 +435,7 @@ def render_sidebar():
         # Clear conversation button with session state reset
         if st.button("🗑️ 清除對話", use_container_width=True, help="清除所有對話記錄並重置聊天狀態"):
             st.session_state.messages = []
+            client.reset_session()
             st.session_state.last_update_time = datetime.now()
             st.success("✅ 對話已清除")
             st.rerun()
@@ -441,7 +480,46 @@ def render_sidebar():
                     st.text("AWS Account: 無法取得")
                     st.text("User ARN: 無法取得")
 
-def render_chat_message(role: str, content: str, timestamp: str = None):
+def _stale_caption(block: dict):
+    """Show a caption when a block was served from cache during an upstream slowdown"""
+    if block.get('stale'):
+        st.caption(f"⏳ 快取資料（約 {int((block.get('age_seconds') or 0) // 60)} 分鐘前）")
+
+def render_info_cards(blocks: dict):
+    """Render typed weather, sun-time and event blocks as cards"""
+    for weather in blocks.get('weather', []):
+        with st.container(border=True):
+            st.markdown(f"**🌤️ {weather.get('city')}, {weather.get('country')}** — {weather.get('conditions')}")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("溫度", f"{weather.get('temperature')}°C")
+            col2.metric("體感溫度", f"{weather.get('feels_like')}°C")
+            col3.metric("濕度", f"{weather.get('humidity')}%")
+            _stale_caption(weather)
+    
+    for sun in blocks.get('sun_times', []):
+        with st.container(border=True):
+            st.markdown(f"**☀️ {sun.get('city')} 日出日落** — {sun.get('date')}")
+            col1, col2 = st.columns(2)
+            col1.metric("日出", sun.get('sunrise') or '-')
+            col2.metric("日落", sun.get('sunset') or '-')
+            _stale_caption(sun)
+    
+    # Event blocks are one per event; show them as one card per city
+    events_by_city = {}
+    for event in blocks.get('events', []):
+        events_by_city.setdefault(event.get('city'), []).append(event)
+    for city, events in events_by_city.items():
+        with st.container(border=True):
+            st.markdown(f"**🎉 {city} 活動**")
+            for event in events:
+                when = ' '.join(part for part in (event.get('date'), event.get('time')) if part)
+                line = f"- **{event.get('name')}** · {when} · {event.get('venue') or ''}"
+                if event.get('url'):
+                    line += f" · [購票]({event['url']})"
+                st.markdown(line)
+            _stale_caption(events[0])
+
+def render_chat_message(role: str, content: str, timestamp: str = None, blocks: dict = None):
     """Render chat message with proper styling"""
     with st.chat_message(role):
         if role == "user":
@@ -450,6 +528,8 @@ def render_chat_message(role: str, content: str, timestamp: str = None):
             st.markdown(f"**🧠 天氣助手:**")
             # Use st.markdown to properly render weather information with formatting
             st.markdown(content)
+            if blocks:
+                render_info_cards(blocks)
         
         if timestamp:
             st.caption(f"時間: {timestamp}")
@@ -686,7 +766,8 @@ def main():
                 render_chat_message(
                     message["role"], 
                     message["content"], 
-                    message.get("timestamp")
+                    message.get("timestamp"),
+                    message.get("metadata", {}).get("blocks")
                 )
     else:
         # Show welcome message when no chat history
@@ -0,0 +1,87 @@
+import pytest
+
+from city_data import UnknownCityError, resolve_city
+from city_index import CityIndex, normalize
+
+
+@pytest.fixture(scope="module")
+def index():
+    return CityIndex.load()
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("台北", "Taipei"),
+    ("臺北市", "Taipei"),
+    ("Taipei", "Taipei"),
+    ("纽约", "New York"),
+    ("紐约", "New York"),
+    ("NYC", "New York"),
+    ("nyc", "New York"),
+    ("L.A.", "Los Angeles"),
+    ("ZÜRICH", "Zurich"),
+    ("Hong-Kong", "Hong Kong"),
+    ("서울", "Seoul"),
+    ("new york city", "New York"),
+    ("新北市", "New Taipei"),
+    ("New Taipei City", "New Taipei"),
+    ("桃園", "Taoyuan"),
+    ("基隆", "Keelung"),
+    ("花蓮", "Hualien"),
+    ("臺東", "Taitung"),
+    ("台东", "Taitung"),
+    ("Taiyuan", "Taiyuan"),
+])
+def test_exact_aliases_across_scripts(index, query, expected):
+    assert index.resolve(query).name == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Tokio", "Tokyo"),
+    ("Londn", "London"),
+    ("San Fransisco", "San Francisco"),
+    ("Kaoshiung", "Kaohsiung"),
+    ("Melborne", "Melbourne"),
+])
+def test_misspellings_resolve(index, query, expected):
+    assert index.resolve(query).name == expected
+
+
+@pytest.mark.parametrize("query", [
+    # Real cities outside the index must not be mistaken for an indexed one
+    "Lyon", "Bern", "Cali", "Laos", "Newark", "宜蘭", "仁川",
+    "Xyzzy", "台比", "",
+])
+def test_unknown_cities_do_not_resolve(index, query):
+    assert index.resolve(query) is None
+
+
+def test_resolved_city_carries_id_coordinates_and_timezone(index):
+    city = index.resolve("倫敦")
+    assert (city.id, city.country, city.timezone) == (2643743, "GB", "Europe/London")
+    assert city.to_dict()["lat"] == pytest.approx(51.5085)
+    assert index.resolve("台北").utc_offset_seconds() == 8 * 3600
+
+
+def test_normalize_folds_width_accents_and_variants():
+    assert normalize("São  Paulo") == normalize("sao-paulo")
+    assert normalize("ＴＡＩＰＥＩ") == "taipei"
+    assert normalize("臺灣") == normalize("台湾")
+
+
+def test_resolve_city_uses_coordinates_for_indexed_and_raw_name_for_unknown_latin():
+    resolved = resolve_city("東京")
+    assert (resolved.key, resolved.name) == (1850147, "Tokyo")
+    assert resolved.params == {"lat": 35.6895, "lon": 139.6917}
+    assert resolve_city("Lyon").params == {"q": "Lyon"}
+
+
+@pytest.mark.parametrize("name", ["Kraków", "Montréal", "Malmö", "Düsseldorf", "Reykjavík"])
+def test_accented_latin_names_go_to_openweather_as_typed(name):
+    resolved = resolve_city(name)
+    assert resolved.params == {"q": name} and resolved.city is None
+
+
+@pytest.mark.parametrize("name", ["仁川", "札幌", "부산", "ソウル"])
+def test_resolve_city_asks_for_translation_of_unknown_cjk_name(name):
+    with pytest.raises(UnknownCityError, match="English"):
+        resolve_city(name)
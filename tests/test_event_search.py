@@ -0,0 +1,120 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from event_search import (MAX_EVENT_LIMIT, UnrecognizedTimeError, build_event_query, clamp_limit,
+                          collect_events, resolve_date_range, search_events)
+
+# Monday 2026-10-19, 10:00 local time
+NOW = datetime(2026, 10, 19, 10, 0)
+
+
+class StubResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class StubSession:
+    """Serves pages of fake events and records which pages were requested"""
+
+    def __init__(self, total_pages, per_page, cancelled=()):
+        self.total_pages = total_pages
+        self.per_page = per_page
+        self.cancelled = set(cancelled)
+        self.pages = []
+        self.timeouts = []
+
+    def get(self, url, params, timeout):
+        page = params["page"]
+        self.pages.append(page)
+        self.timeouts.append(timeout)
+        events = []
+        for i in range(self.per_page):
+            name = f"event-{page}-{i}"
+            status = "cancelled" if name in self.cancelled else "onsale"
+            events.append({"name": name, "dates": {"status": {"code": status}}})
+        return StubResponse({"_embedded": {"events": events}, "page": {"totalPages": self.total_pages}})
+
+
+def test_today_starts_now_and_ends_at_midnight():
+    assert resolve_date_range("today", now=NOW) == (NOW, datetime(2026, 10, 20))
+
+
+def test_tonight_starts_at_five_pm_local():
+    assert resolve_date_range("tonight", now=NOW) == (datetime(2026, 10, 19, 17), datetime(2026, 10, 20))
+
+
+def test_weekend_from_weekday_and_from_sunday():
+    assert resolve_date_range("this weekend", now=NOW) == (datetime(2026, 10, 24), datetime(2026, 10, 26))
+    sunday = datetime(2026, 10, 25, 9, 30)
+    assert resolve_date_range("週末", now=sunday) == (sunday, datetime(2026, 10, 26))
+
+
+def test_next_week_and_explicit_date():
+    assert resolve_date_range("next week", now=NOW) == (datetime(2026, 10, 26), datetime(2026, 11, 2))
+    assert resolve_date_range("2026-11-01", now=NOW) == (datetime(2026, 11, 1), datetime(2026, 11, 2))
+
+
+def test_weekdays_next_weekend_and_slashed_date():
+    assert resolve_date_range("this friday", now=NOW) == (datetime(2026, 10, 23), datetime(2026, 10, 24))
+    assert resolve_date_range("星期一", now=NOW) == (NOW, datetime(2026, 10, 20))
+    assert resolve_date_range("next weekend", now=NOW) == (datetime(2026, 10, 31), datetime(2026, 11, 2))
+    assert resolve_date_range("2026/11/01", now=NOW) == (datetime(2026, 11, 1), datetime(2026, 11, 2))
+
+
+def test_unknown_phrase_is_reported_not_dropped():
+    assert resolve_date_range(None, now=NOW) == (None, None)
+    for phrase in ("someday", "December"):
+        with pytest.raises(UnrecognizedTimeError):
+            resolve_date_range(phrase, now=NOW)
+    with pytest.raises(UnrecognizedTimeError):
+        build_event_query("London", "key", when="someday", now=NOW)
+
+
+def test_limit_is_clamped():
+    assert clamp_limit(-3) == 1
+    assert clamp_limit(0) == 1
+    assert clamp_limit(10_000) == MAX_EVENT_LIMIT
+    assert build_event_query("London", "key", limit=-1, now=NOW)["size"] == 3
+    session = StubSession(total_pages=1, per_page=3)
+    assert len(search_events("London", "key", limit=-5, session=session)) == 1
+
+
+def test_query_uses_local_start_range_and_classification():
+    params = build_event_query("London", "key", when="tonight", category="concerts", limit=3, now=NOW)
+    assert params["localStartDateTime"] == "2026-10-19T17:00:00,2026-10-19T23:59:59"
+    assert params["classificationName"] == "Music"
+    assert params["sort"] == "date,asc"
+    assert params["size"] == 5
+
+
+def test_search_stops_paging_once_limit_is_reached():
+    session = StubSession(total_pages=10, per_page=5)
+    events = search_events("London", "key", limit=7, session=session)
+    assert len(events) == 7
+    assert session.pages == [0, 1]
+
+
+def test_search_stops_at_last_page_and_skips_cancelled():
+    session = StubSession(total_pages=2, per_page=3, cancelled={"event-0-1"})
+    events = search_events("London", "key", limit=10, session=session)
+    assert [event["name"] for event in events] == ["event-0-0", "event-0-2", "event-1-0", "event-1-1", "event-1-2"]
+    assert session.pages == [0, 1]
+
+
+def test_paging_stops_at_the_deadline():
+    session = StubSession(total_pages=10, per_page=2)
+    params = build_event_query("London", "key", limit=5, now=NOW)
+    assert collect_events(params, limit=50, session=session, deadline=time.monotonic() - 1) == []
+    assert session.pages == []
+
+    events = collect_events(params, limit=4, session=session, deadline=time.monotonic() + 2)
+    assert len(events) == 4
+    assert all(timeout <= 2 for timeout in session.timeouts)
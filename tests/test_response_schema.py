@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from response_schema import (MIN_COMPRESS_BYTES, RESPONSE_SCHEMA_VERSION, build_response,
+                             decode_response, encode_response, schema_version_error, supported_encodings)
+
+FRESH = {"stale": False, "age_seconds": 0.0}
+
+
+def tool_turn(tool_name, tool_use_id, payload, status="success", tool_input=None):
+    """Assistant tool call plus the user message carrying its result"""
+    return [
+        {"role": "assistant", "content": [{"toolUse": {"toolUseId": tool_use_id, "name": tool_name,
+                                                       "input": tool_input or {}}}]},
+        {"role": "user", "content": [{"toolResult": {"toolUseId": tool_use_id, "status": status,
+                                                     "content": [{"text": json.dumps(payload)}]}}]},
+    ]
+
+
+def large_response():
+    events = [{"name": f"Concert {i}", "date": "2026-10-24", "time": "19:30:00",
+               "venue": "Royal Albert Hall", "category": "Music", "url": f"https://example.com/e/{i}"}
+              for i in range(10)]
+    messages = tool_turn("find_events", "e1", {"city": "London", "events": events, "freshness": FRESH})
+    return build_response({"role": "assistant", "content": [{"text": "Here are the concerts."}]}, messages)
+
+
+def test_build_response_collects_typed_blocks_and_skips_errors():
+    messages = (tool_turn("current_weather", "w1", {"weather": {"city": "London", "temperature": 12, "lat": 51.5},
+                                                    "freshness": {"stale": True, "age_seconds": 700.0}})
+                + tool_turn("sun_times", "s1", {"error": "sun_times did not respond within 3s"})
+                + tool_turn("find_events", "e1", {"events": []}, status="error"))
+    response = build_response({"role": "assistant", "content": [{"text": "Hi"}, {"text": "there"}]}, messages)
+
+    assert response["v"] == RESPONSE_SCHEMA_VERSION
+    assert response["answer"] == "Hi\nthere"
+    assert response["weather"] == [{"city": "London", "country": None, "temperature": 12, "feels_like": None,
+                                    "humidity": None, "conditions": None, "wind_speed": None,
+                                    "stale": True, "age_seconds": 700.0}]
+    assert response["sun_times"] == [] and response["events"] == []
+
+
+def test_blocks_are_flat_and_carry_their_city():
+    sun = {"date": "2026-10-19", "sunrise": "07:21", "sunset": "17:52", "solar_noon": "12:36",
+           "day_length_seconds": 37860}
+    messages = (tool_turn("sun_times", "s1", {"sun_times": sun, "freshness": FRESH}, tool_input={"city": "倫敦"})
+                + tool_turn("find_events", "e1", {"city": "London", "window": None, "freshness": FRESH,
+                                                  "events": [{"name": "Gig", "date": "2026-10-24", "url": "u"}]}))
+    response = build_response({"role": "assistant", "content": [{"text": "Done"}]}, messages)
+
+    assert response["sun_times"] == [{"city": "倫敦", **sun, "stale": False, "age_seconds": 0.0}]
+    assert response["events"] == [{"city": "London", "name": "Gig", "date": "2026-10-24", "time": None,
+                                   "venue": None, "category": None, "url": "u", "stale": False, "age_seconds": 0.0}]
+
+
+def test_only_supported_schema_versions_are_accepted():
+    assert schema_version_error(RESPONSE_SCHEMA_VERSION) is None
+    for version in (2, 0, "1", True):
+        error = schema_version_error(version)
+        assert error["code"] == "UnsupportedSchemaVersion"
+        assert error["supported"] == [1]
+
+
+@pytest.mark.parametrize("encoding", supported_encodings())
+def test_round_trip_for_every_supported_encoding(encoding):
+    response = large_response()
+    encoded = encode_response(response, [encoding])
+    assert decode_response(encoded) == response
+
+
+def test_compressed_envelope_is_smaller_than_plain_json():
+    response = large_response()
+    encoded = encode_response(response, supported_encodings())
+    assert encoded["encoding"] != "identity"
+    assert len(json.dumps(encoded)) < len(json.dumps(response))
+
+
+def test_small_payloads_and_unknown_encodings_stay_plain():
+    small = build_response({"role": "assistant", "content": [{"text": "Sunny."}]}, [])
+    assert len(json.dumps(small)) < MIN_COMPRESS_BYTES
+    assert encode_response(small, ["gzip"]) is small
+    assert encode_response(large_response(), ["br"])["answer"] == "Here are the concerts."
+
+
+def test_unsupported_encoding_is_rejected_on_decode():
+    with pytest.raises(ValueError):
+        decode_response({"v": 1, "encoding": "br", "data": ""})
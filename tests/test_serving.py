@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from serving import AgentSessions, RequestGate, ServerBusyError, ServingConfig
+
+
+def new_agent(callback_handler=None):
+    return object()
+
+
+class TrimmingAgent:
+    """Fake agent whose conversation manager keeps only the last `window` messages, like Strands"""
+
+    def __init__(self, callback_handler, window=4):
+        self.callback_handler = callback_handler
+        self.window = window
+        self.messages = []
+
+    def _add(self, message):
+        self.messages.append(message)
+        self.callback_handler(message=message)
+        del self.messages[:-self.window]
+
+    def __call__(self, prompt):
+        self._add({"role": "user", "content": [{"text": prompt}]})
+        self.callback_handler(data="streamed text")
+        for i in range(3):
+            self._add({"role": "assistant", "content": [{"toolUse": {"toolUseId": f"{prompt}-{i}"}}]})
+            self._add({"role": "user", "content": [{"toolResult": {"toolUseId": f"{prompt}-{i}"}}]})
+        self._add({"role": "assistant", "content": [{"text": f"answer to {prompt}"}]})
+        return self.messages[-1]
+
+
+def run_gated(gate, count, work_seconds):
+    """Fire `count` concurrent requests through the gate and collect outcomes in order"""
+    async def one():
+        try:
+            await gate.run(time.sleep, work_seconds)
+            return "ok"
+        except ServerBusyError:
+            return "busy"
+
+    async def main():
+        return await asyncio.gather(*(one() for _ in range(count)))
+
+    return asyncio.run(main())
+
+
+def test_rejects_when_queue_is_full():
+    gate = RequestGate(ServingConfig(max_concurrency=2, max_queue=1, queue_timeout=5))
+    outcomes = run_gated(gate, count=5, work_seconds=0.1)
+
+    assert sorted(outcomes) == ["busy", "busy", "ok", "ok", "ok"]
+    metrics = gate.metrics()
+    assert metrics["rejected"] == 2
+    assert metrics["completed"] == 3
+    assert metrics["in_flight"] == 0 and metrics["queue_depth"] == 0
+
+
+def test_queued_request_times_out():
+    gate = RequestGate(ServingConfig(max_concurrency=1, max_queue=5, queue_timeout=0.05))
+    outcomes = run_gated(gate, count=2, work_seconds=0.3)
+
+    assert outcomes == ["ok", "busy"]
+    assert gate.metrics()["timed_out"] == 1
+
+
+def test_reports_saturation_while_running():
+    gate = RequestGate(ServingConfig(max_concurrency=1, max_queue=0, queue_timeout=1))
+    seen = []
+
+    async def main():
+        task = asyncio.ensure_future(gate.run(time.sleep, 0.1))
+        await asyncio.sleep(0.02)
+        seen.append(gate.is_saturated())
+        await task
+
+    asyncio.run(main())
+    assert seen == [True]
+    assert not gate.is_saturated()
+
+
+def test_failed_work_is_counted_and_reraised():
+    gate = RequestGate(ServingConfig(max_concurrency=1, max_queue=0, queue_timeout=1))
+
+    def boom():
+        raise RuntimeError("agent failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(gate.run(boom))
+    assert gate.metrics()["failed"] == 1
+
+
+def test_cancelled_request_holds_its_slot_until_the_worker_finishes():
+    gate = RequestGate(ServingConfig(max_concurrency=1, max_queue=0, queue_timeout=1))
+    seen = []
+
+    async def main():
+        task = asyncio.ensure_future(gate.run(time.sleep, 0.1))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        await asyncio.sleep(0.02)
+        seen.append((gate.metrics()["in_flight"], gate.is_saturated()))
+        with pytest.raises(ServerBusyError):
+            await gate.run(time.sleep, 0)
+        await asyncio.sleep(0.15)
+        seen.append((gate.metrics()["in_flight"], gate.is_saturated()))
+
+    asyncio.run(main())
+    assert seen == [(1, True), (0, False)]
+
+
+def test_default_concurrency_scales_with_cpus(monkeypatch):
+    monkeypatch.delenv("AGENT_MAX_CONCURRENCY", raising=False)
+    monkeypatch.setattr("os.cpu_count", lambda: 2)
+    assert ServingConfig().max_concurrency == 8
+
+
+def test_config_falls_back_on_bad_environment(monkeypatch):
+    monkeypatch.setenv("AGENT_QUEUE_TIMEOUT_SECONDS", "soon")
+    monkeypatch.setenv("AGENT_MAX_QUEUE", "-3")
+    config = ServingConfig(max_concurrency=4)
+    assert config.queue_timeout == 30.0
+    assert config.max_queue == 8
+    assert ServingConfig(max_concurrency=1, queue_timeout=0).queue_timeout == 0
+
+
+def test_sessions_keep_agent_per_session_and_evict_lru():
+    created = []
+
+    def factory(callback_handler=None):
+        created.append(object())
+        return created[-1]
+
+    sessions = AgentSessions(factory, ServingConfig(max_concurrency=1, max_sessions=2, session_idle_timeout=60))
+    with sessions.checkout("a") as first:
+        pass
+    with sessions.checkout("a") as again:
+        assert again is first
+    with sessions.checkout("b"):
+        pass
+    with sessions.checkout("c"):
+        pass
+
+    assert len(sessions) == 2
+    with sessions.checkout("a") as recreated:
+        assert recreated is not first
+
+
+def test_sessions_without_id_are_not_stored():
+    sessions = AgentSessions(new_agent, ServingConfig(max_concurrency=1))
+    with sessions.checkout(None) as one, sessions.checkout("") as two:
+        assert one is not two
+    assert len(sessions) == 0
+
+
+def test_idle_sessions_are_evicted():
+    sessions = AgentSessions(new_agent, ServingConfig(max_concurrency=1, session_idle_timeout=0.01))
+    with sessions.checkout("a") as first:
+        pass
+    time.sleep(0.03)
+    with sessions.checkout("a") as second:
+        assert second is not first
+
+
+def test_turns_of_one_session_run_one_at_a_time():
+    sessions = AgentSessions(new_agent, ServingConfig(max_concurrency=2))
+    active = []
+    overlaps = []
+
+    def turn():
+        with sessions.checkout("a"):
+            active.append(1)
+            overlaps.append(len(active))
+            time.sleep(0.05)
+            active.pop()
+
+    threads = [threading.Thread(target=turn) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(overlaps) == 1
+
+
+def test_turn_messages_survive_history_trimming():
+    sessions = AgentSessions(TrimmingAgent, ServingConfig(max_concurrency=1))
+    sessions.run_turn("a", "first")
+    result, messages = sessions.run_turn("a", "second")
+
+    assert result["content"][0]["text"] == "answer to second"
+    assert len(messages) == 8
+    assert messages[0]["content"][0]["text"] == "second"
+    tool_ids = [block["toolUse"]["toolUseId"] for m in messages for block in m["content"] if "toolUse" in block]
+    assert tool_ids == ["second-0", "second-1", "second-2"]
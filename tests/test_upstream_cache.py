@@ -0,0 +1,133 @@
+import importlib
+import threading
+import time
+
+import pytest
+
+import upstream_cache
+from upstream_cache import StaleWhileRevalidateCache, UpstreamUnavailableError
+
+
+class CountingFetch:
+    """Fetch function returning an increasing counter, optionally slowly"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            value = self.calls
+        time.sleep(self.delay)
+        return value
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_fresh_value_is_served_without_refetching():
+    cache = StaleWhileRevalidateCache()
+    fetch = CountingFetch()
+    assert cache.get(("weather", "a"), fetch, ttl=60).value == 1
+    result = cache.get(("weather", "a"), fetch, ttl=60)
+    assert result.value == 1 and not result.stale
+    assert fetch.calls == 1
+
+
+def test_expired_value_is_served_stale_and_refreshed_in_background():
+    cache = StaleWhileRevalidateCache()
+    fetch = CountingFetch()
+    cache.get(("weather", "a"), fetch, ttl=0.01)
+    time.sleep(0.02)
+
+    fetch.delay = 0.2
+    started = time.monotonic()
+    result = cache.get(("weather", "a"), fetch, ttl=0.01)
+    assert time.monotonic() - started < 0.1
+    assert result.value == 1 and result.stale
+    assert result.freshness()["stale"] is True
+
+    assert wait_for(lambda: cache.get(("weather", "a"), fetch, ttl=60).value == 2)
+
+
+def test_value_older_than_max_stale_is_not_served():
+    cache = StaleWhileRevalidateCache()
+    fetch = CountingFetch()
+    cache.get(("events", "a"), fetch, ttl=0.01)
+    time.sleep(0.03)
+
+    result = cache.get(("events", "a"), fetch, ttl=0.01, max_stale=0.02)
+    assert result.value == 2 and not result.stale
+
+
+def test_miss_is_bounded_by_latency_budget_and_fills_cache_later():
+    cache = StaleWhileRevalidateCache()
+    fetch = CountingFetch(delay=0.2)
+
+    started = time.monotonic()
+    with pytest.raises(UpstreamUnavailableError):
+        cache.get(("weather", "slow"), fetch, ttl=60, budget=0.05)
+    assert time.monotonic() - started < 0.15
+
+    # The abandoned fetch keeps running and its result serves the next caller
+    time.sleep(0.25)
+    assert cache.get(("weather", "slow"), fetch, ttl=60, budget=0.01).value == 1
+    assert fetch.calls == 1
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = StaleWhileRevalidateCache()
+    fetch = CountingFetch(delay=0.1)
+    results = []
+
+    def worker():
+        results.append(cache.get(("weather", "a"), fetch, ttl=60, budget=1).value)
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fetch.calls == 1
+    assert results == [1] * 5
+
+
+def test_failed_fetch_with_nothing_cached_raises():
+    cache = StaleWhileRevalidateCache()
+
+    def down():
+        raise RuntimeError("503")
+
+    with pytest.raises(UpstreamUnavailableError, match="503"):
+        cache.get(("sun_times", "a"), down, ttl=60)
+
+
+def test_slow_upstream_does_not_starve_the_others():
+    cache = StaleWhileRevalidateCache(max_workers=1)
+    release = threading.Event()
+    with pytest.raises(UpstreamUnavailableError):
+        cache.get(("events", "a"), release.wait, ttl=60, budget=0.01)
+
+    try:
+        assert cache.get(("weather", "a"), CountingFetch(), ttl=60, budget=0.5).value == 1
+    finally:
+        release.set()
+
+
+def test_bad_environment_values_fall_back_to_defaults(monkeypatch):
+    monkeypatch.setenv("UPSTREAM_LATENCY_BUDGET_SECONDS", "fast")
+    monkeypatch.setenv("UPSTREAM_MAX_STALE_SECONDS", "-1")
+    try:
+        module = importlib.reload(upstream_cache)
+        assert module.DEFAULT_LATENCY_BUDGET_SECONDS == 3.0
+        assert module.DEFAULT_MAX_STALE_SECONDS == 86400.0
+    finally:
+        monkeypatch.undo()
+        importlib.reload(upstream_cache)
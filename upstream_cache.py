@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from settings import env_float
+
+logger = logging.getLogger(__name__)
+
+# Hard cap on how long a caller waits for any upstream before giving up
+DEFAULT_LATENCY_BUDGET_SECONDS = env_float("UPSTREAM_LATENCY_BUDGET_SECONDS", 3.0)
+# Stale values older than this are no longer served, even during an outage
+DEFAULT_MAX_STALE_SECONDS = env_float("UPSTREAM_MAX_STALE_SECONDS", 86400.0)
+DEFAULT_MAX_ENTRIES = 1024
+# Background fetch threads per upstream; each upstream has its own pool so a slow one cannot starve the rest
+DEFAULT_WORKERS_PER_UPSTREAM = 4
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when an upstream misses its latency budget or fails with nothing cached"""
+
+
+class CachedResult:
+    """A value returned from the cache together with its freshness"""
+
+    def __init__(self, value, fetched_at, stale):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.stale = stale
+
+    @property
+    def age_seconds(self):
+        return time.time() - self.fetched_at
+
+    def freshness(self):
+        """Staleness marker to attach to responses"""
+        return {"stale": self.stale, "age_seconds": round(self.age_seconds, 1)}
+
+
+class StaleWhileRevalidateCache:
+    """In-memory cache that serves last known good values and refreshes them in the background"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_stale=DEFAULT_MAX_STALE_SECONDS,
+                 max_workers=DEFAULT_WORKERS_PER_UPSTREAM):
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self.max_workers = max_workers
+        self._entries = OrderedDict()
+        self._refreshing = {}
+        self._executors = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, fetch, ttl, budget=DEFAULT_LATENCY_BUDGET_SECONDS, max_stale=None):
+        """Return a CachedResult for key, calling fetch() only when the cached value is missing or old.
+
+        Keys are tuples whose first item names the upstream, e.g. ("weather", "london").
+        max_stale overrides the cache-wide limit on how old a served stale value may be.
+        """
+        max_stale = self.max_stale if max_stale is None else max_stale
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None:
+            value, fetched_at = entry
+            age = now - fetched_at
+            if age < ttl:
+                return CachedResult(value, fetched_at, stale=False)
+            if age < max_stale:
+                # Serve the old value right away and let a background refresh catch up
+                self._refresh(key, fetch)
+                return CachedResult(value, fetched_at, stale=True)
+
+        # Nothing usable cached: wait for the upstream, but never past the budget
+        future = self._refresh(key, fetch)
+        try:
+            value = future.result(timeout=budget)
+        except FutureTimeoutError:
+            # The fetch keeps running and fills the cache for the next caller
+            raise UpstreamUnavailableError(f"{key[0]} did not respond within {budget:g}s")
+        except Exception as e:
+            raise UpstreamUnavailableError(f"{key[0]} request failed: {e}")
+        return CachedResult(value, time.time(), stale=False)
+
+    def _refresh(self, key, fetch):
+        """Start at most one concurrent fetch per key and store its result when it lands"""
+        with self._lock:
+            future = self._refreshing.get(key)
+            if future is not None:
+                return future
+            future = self._executor_for(key[0]).submit(fetch)
+            self._refreshing[key] = future
+        future.add_done_callback(lambda f: self._store(key, f))
+        return future
+
+    def _executor_for(self, upstream):
+        """Worker pool for one upstream, created on first use (called with the lock held)"""
+        executor = self._executors.get(upstream)
+        if executor is None:
+            executor = self._executors[upstream] = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=f"upstream-{upstream}"
+            )
+        return executor
+
+    def _store(self, key, future):
+        with self._lock:
+            self._refreshing.pop(key, None)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                logger.warning("Refresh of %s failed: %s", key, error)
+                return
+            self._entries[key] = (future.result(), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -1,22 +1,94 @@
+import json
+import logging
 import os
 from bedrock_agentcore import BedrockAgentCoreApp
-from strands import Agent
-from strands_tools import http_request
+from bedrock_agentcore.runtime.models import PingStatus
+from strands import Agent, tool
+
+import city_data
+from city_data import UnknownCityError
+from event_search import DEFAULT_EVENT_LIMIT, UnrecognizedTimeError
+from response_schema import build_response, encode_response, schema_version_error
+from serving import AgentSessions, RequestGate, ServerBusyError
+from upstream_cache import UpstreamUnavailableError
+
+logger = logging.getLogger(__name__)
 
 # Create BedrockAgentCoreApp instance
 app = BedrockAgentCoreApp()
 
 # API configurations
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "OPENWEATHER_API_KEY")
-OPENWEATHER_BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
 TICKETMASTER_API_KEY = os.getenv("TICKETMASTER_API_KEY", "TICKETMASTER_API_KEY")
-TICKETMASTER_BASE_URL = "https://app.ticketmaster.com/discovery/v2/events.json"
-SUNRISE_SUNSET_BASE_URL = "https://api.sunrise-sunset.org/json"
 
-# Set up Agent with http_request tool and comprehensive prompt
-agent = Agent(
-    tools=[http_request],
-    system_prompt=f"""You are a comprehensive city information assistant that can provide weather, events, and sunrise/sunset information. 
+def _tool_result(field, cached):
+    """Serialize a cached upstream value with its staleness marker"""
+    return json.dumps({field: cached.value, "freshness": cached.freshness()}, ensure_ascii=False)
+
+def _unknown_city_result(city, error):
+    """Tell the model to translate a city name the local index could not resolve"""
+    return json.dumps({"error": str(error), "unresolved_city": city}, ensure_ascii=False)
+
+@tool
+def current_weather(city: str) -> str:
+    """Get current weather conditions for a city.
+
+    Args:
+        city: City name as the user wrote it, e.g. "London", "台北" or "NYC"
+    """
+    try:
+        return _tool_result("weather", city_data.get_weather(city, OPENWEATHER_API_KEY))
+    except UnknownCityError as e:
+        return _unknown_city_result(city, e)
+    except UpstreamUnavailableError as e:
+        return json.dumps({"error": str(e)})
+
+@tool
+def sun_times(city: str) -> str:
+    """Get today's sunrise and sunset times for a city in its local time.
+
+    Args:
+        city: City name as the user wrote it, e.g. "Tokyo" or "東京"
+    """
+    try:
+        return _tool_result("sun_times", city_data.get_sun_times(city, OPENWEATHER_API_KEY))
+    except UnknownCityError as e:
+        return _unknown_city_result(city, e)
+    except UpstreamUnavailableError as e:
+        return json.dumps({"error": str(e)})
+
+@tool
+def find_events(city: str, when: str = None, category: str = None, keyword: str = None,
+                limit: int = DEFAULT_EVENT_LIMIT) -> str:
+    """Search Ticketmaster events in a city with the filters applied upstream.
+
+    Args:
+        city: City name as the user wrote it, e.g. "London" or "紐約"
+        when: Optional time window such as "today", "tonight", "tomorrow", "this weekend",
+            "next weekend", "this week", "next week", "this month", a weekday like "friday",
+            or a YYYY-MM-DD date
+        category: Optional category such as "concerts", "sports", "theatre", "film" or "family"
+        keyword: Optional free-text keyword, e.g. an artist or team name
+        limit: Maximum number of events to return
+    """
+    if TICKETMASTER_API_KEY == "TICKETMASTER_API_KEY":
+        return json.dumps({"error": "Ticketmaster API key is not configured"})
+    try:
+        # Time phrases are resolved in the city's local time, from the index timezone or the cached weather lookup
+        utc_offset = city_data.city_utc_offset(city, OPENWEATHER_API_KEY) if when else None
+        cached, window = city_data.get_events(city, TICKETMASTER_API_KEY, when=when, category=category,
+                                              keyword=keyword, limit=limit, utc_offset_seconds=utc_offset)
+    except UnknownCityError as e:
+        return _unknown_city_result(city, e)
+    except UnrecognizedTimeError as e:
+        return json.dumps({"error": str(e), "unrecognized_when": when}, ensure_ascii=False)
+    except UpstreamUnavailableError as e:
+        return json.dumps({"error": str(e)})
+    return json.dumps({"city": city, "window": window, "events": cached.value,
+                       "freshness": cached.freshness()}, ensure_ascii=False)
+
+# Comprehensive prompt shared by every per-request agent
+SYSTEM_PROMPT = """You are a comprehensive city information assistant that can provide weather, events, and sunrise/sunset information. 
 
 CAPABILITIES:
 1. Weather Information
@@ -25,34 +97,75 @@ CAPABILITIES:
 
 WEATHER QUERIES:
 When users ask about weather in a city:
-1. Use http_request to call: {OPENWEATHER_BASE_URL}?q={{city}}&appid={OPENWEATHER_API_KEY}&units=metric
+1. Use the current_weather tool with the city name
 2. Parse and format: temperature, conditions, humidity, city/country info
 
 EVENT QUERIES:
 When users ask about events in a city:
-1. Use http_request to call: {TICKETMASTER_BASE_URL}?city={{city}}&apikey={TICKETMASTER_API_KEY}
-2. Parse and format: event names, dates, venues, descriptions from the Ticketmaster API response
-3. Handle the JSON response structure with _embedded.events array containing event details
-4. If no Ticketmaster API key is available, inform the user that event search requires API key configuration
+1. Use the find_events tool instead of calling Ticketmaster directly
+2. Pass the user's constraints as arguments: "when" for time phrases (e.g. "this weekend"), "category" for event types (e.g. "concerts"), "keyword" for artists or teams, and "limit" for how many they want
+3. Parse and format: event names, dates, times, venues and links from the returned events list
+4. If the tool returns an error about the API key, inform the user that event search requires API key configuration
 
 SUNRISE/SUNSET QUERIES:
 When users ask about sunrise/sunset times:
-1. First get coordinates using weather API: {OPENWEATHER_BASE_URL}?q={{city}}&appid={OPENWEATHER_API_KEY}
-2. Extract lat/lon from the response
-3. Use http_request to call: {SUNRISE_SUNSET_BASE_URL}?lat={{lat}}&lng={{lon}}&formatted=0
-4. Parse and format: sunrise/sunset times in local timezone
+1. Use the sun_times tool with the city name; it resolves coordinates itself
+2. Parse and format: sunrise/sunset times, already converted to the city's local time
+
+CITY NAMES:
+Pass city names to the tools exactly as the user wrote them (Chinese, English or abbreviations such as "NYC"); the tools resolve them to canonical cities locally.
+If a tool result contains "unresolved_city", call the tool again with that city's English name (e.g. 仁川 -> Incheon, 札幌 -> Sapporo).
 
 MULTI-FEATURE QUERIES:
 Handle requests that combine multiple features (e.g., "Tell me about weather and events in London")
 
+DATA FRESHNESS:
+Tool results include a "freshness" object. If "stale" is true, answer with the cached data right away and mention that it is from about "age_seconds" ago because the live service is slow or unavailable.
+
 Always provide helpful, conversational responses. If an API is unavailable or returns errors, provide clear explanations."""
-)
+
+def create_agent(callback_handler=None):
+    """Create an Agent with its own conversation state for one session"""
+    return Agent(
+        tools=[current_weather, sun_times, find_events],
+        system_prompt=SYSTEM_PROMPT,
+        callback_handler=callback_handler
+    )
+
+# Admission control: bounded in-flight requests and wait queue per container
+gate = RequestGate()
+# Conversation state isolated per runtime session
+sessions = AgentSessions(create_agent, gate.config)
+
+@app.ping
+def ping():
+    """Report busy while every worker slot is taken so new sessions route elsewhere"""
+    return PingStatus.HEALTHY_BUSY if gate.is_saturated() else PingStatus.HEALTHY
 
 @app.entrypoint
-def invoke(payload):
+async def invoke(payload, context):
     """Handle user requests for weather information"""
+    if payload.get("action") == "metrics":
+        return {"metrics": {**gate.metrics(), "sessions": len(sessions)}}
+
+    # Reject schema versions this agent cannot produce before spending a turn on them
+    schema_version = payload.get("schema_version")
+    if schema_version is not None:
+        version_error = schema_version_error(schema_version)
+        if version_error is not None:
+            return {"error": version_error}
+
     user_message = payload.get("prompt", "Hello! How can I help you with weather information today?")
-    result = agent(user_message)
+    try:
+        result, turn_messages = await gate.run(sessions.run_turn, context.session_id, user_message)
+    except ServerBusyError as e:
+        logger.warning("Rejected request: %s (%s)", e, gate.metrics())
+        return {"error": {"code": "ServerBusy", "message": str(e), "retryable": True}}
+
+    # Clients that declare the compact schema get typed blocks; others keep the raw message
+    if schema_version is not None:
+        response = build_response(result.message, turn_messages)
+        return encode_response(response, payload.get("accept_encoding"))
     return {"result": result.message}
 
 if __name__ == "__main__":